@@ -0,0 +1,169 @@
+"""
+BSD 3-Clause License
+Copyright (c) 2022, Mohamed Abdelkader Zahana
+All rights reserved.
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its
+   contributors may be used to endorse or promote products derived from
+   this software without specific prior written permission.
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import queue
+import struct
+from time import monotonic
+
+from ZLAC8030L_CAN_controller.canopen_controller import MotorController
+
+# Object dictionary indices, see config/eds/ZLAC8030L-V1.0.eds
+CURRENT_SPEED_IDX = 0x606C
+TARGET_SPEED_IDX = 0x60FF
+TARGET_TORQUE_IDX = 0x6071
+# Target torque limits [mA], INTEGER16
+TARGET_TORQUE_LIMIT = 30000
+
+# SDO command specifiers
+SDO_UPLOAD_REQUEST = 0x40
+SDO_DOWNLOAD_4_BYTES = 0x23
+SDO_DOWNLOAD_2_BYTES = 0x2B
+SDO_ABORT = 0x80
+
+# Expedited SDO frame: command, index, subindex, 4 data bytes
+SDO_FRAME = struct.Struct("<BHBi")
+
+
+class BatchMotorController(MotorController):
+    """MotorController that talks to several CAN nodes per request.
+
+    All SDO requests are put on the bus back-to-back and only then are the
+    replies drained from each node's response queue, so the bus round-trip
+    is paid once per batch instead of once per node.
+    """
+
+    def _postSdoRequests(self, node_ids, command, index, values=None):
+        """Sends one expedited SDO request per node without waiting for replies
+
+        Parameters
+        --
+        @param node_ids List of CAN node IDs
+        @param command SDO command specifier
+        @param index Object dictionary index (subindex 0)
+        @param values Optional list of values for the 4 data bytes, packed as int32, one per node
+
+        Returns
+        --
+        @return List of SDO clients, in the same order as node_ids
+        """
+        network = self._network
+        pack = SDO_FRAME.pack
+        sdos = []
+        for i, node_id in enumerate(node_ids):
+            sdo = network[int(node_id)].sdo
+            # Drop stale replies so they are not taken for ours
+            if not sdo.responses.empty():
+                sdo.responses = queue.Queue()
+            value = 0 if values is None else int(values[i])
+            sdo.send_request(pack(command, index, 0, value))
+            sdos.append(sdo)
+        return sdos
+
+    def _batchDeadline(self, sdos):
+        """Time by which all replies of a batch must have arrived"""
+        timeout = max([sdo.RESPONSE_TIMEOUT for sdo in sdos], default=0.0)
+        return monotonic() + timeout
+
+    def _readSdoResponse(self, sdo, index, deadline):
+        """Waits for the reply of a request posted by _postSdoRequests
+
+        Failures are returned rather than raised, so a successful read does
+        not go through any exception handling.
+
+        @param deadline monotonic() time shared by the whole batch, so that
+        silent nodes do not add up their timeouts
+
+        @return (ok, value) where value is the raw int32 carried by the reply.
+        ok is False on timeout, abort, or a reply for another index
+        """
+        try:
+            response = sdo.responses.get(timeout=max(0.0, deadline - monotonic()))
+        except queue.Empty:
+            return (False, 0)
+        command, res_index, _, value = SDO_FRAME.unpack(response)
+        return (command != SDO_ABORT and res_index == index, value)
+
+    def getVelocityBatch(self, node_ids):
+        """Reads the current speed of several nodes in one go
+
+        Parameters
+        --
+        @param node_ids List of CAN node IDs
+
+        Returns
+        --
+        @return dict {node_id: (ok, current speed in rpm)}
+        """
+        sdos = self._postSdoRequests(node_ids, SDO_UPLOAD_REQUEST, CURRENT_SPEED_IDX)
+        deadline = self._batchDeadline(sdos)
+        vels = {}
+        for node_id, sdo in zip(node_ids, sdos):
+            vels[int(node_id)] = self._readSdoResponse(sdo, CURRENT_SPEED_IDX, deadline)
+        return vels
+
+    def setVelocityBatch(self, node_ids, vels):
+        """Sets the target speed of several nodes in one go
+
+        The download requests are sent back-to-back; confirmations are
+        collected only after all of them are on the bus.
+
+        Parameters
+        --
+        @param node_ids List of CAN node IDs
+        @param vels List of target speeds in rpm, one per node
+
+        Returns
+        --
+        @return dict {node_id: ok}
+        """
+        sdos = self._postSdoRequests(node_ids, SDO_DOWNLOAD_4_BYTES, TARGET_SPEED_IDX, values=vels)
+        deadline = self._batchDeadline(sdos)
+        oks = {}
+        for node_id, sdo in zip(node_ids, sdos):
+            oks[int(node_id)] = self._readSdoResponse(sdo, TARGET_SPEED_IDX, deadline)[0]
+        return oks
+
+    def setTorqueBatch(self, node_ids, currents_mA):
+        """Sets the target torque (current) of several nodes in one go, see setVelocityBatch
+
+        Parameters
+        --
+        @param node_ids List of CAN node IDs
+        @param currents_mA List of target currents in mA, one per node.
+        Clamped to the +/-30000 mA range of the drive
+
+        Returns
+        --
+        @return dict {node_id: ok}
+        """
+        # 2-byte expedited download: the int16 goes in data bytes 0-1, bytes 2-3 stay zero
+        values = [int(max(-TARGET_TORQUE_LIMIT, min(TARGET_TORQUE_LIMIT, c))) & 0xFFFF for c in currents_mA]
+        sdos = self._postSdoRequests(node_ids, SDO_DOWNLOAD_2_BYTES, TARGET_TORQUE_IDX, values=values)
+        deadline = self._batchDeadline(sdos)
+        oks = {}
+        for node_id, sdo in zip(node_ids, sdos):
+            oks[int(node_id)] = self._readSdoResponse(sdo, TARGET_TORQUE_IDX, deadline)[0]
+        return oks
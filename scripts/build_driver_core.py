@@ -0,0 +1,19 @@
+"""
+Builds the optional driver_core extension next to this file:
+
+    python3 scripts/build_driver_core.py build_ext --inplace
+
+Without it, pid.VecPID falls back to NumPy.
+"""
+import os
+
+from setuptools import setup, Extension
+from Cython.Build import cythonize
+
+# Build relative to scripts/, wherever this is run from
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+setup(
+    name="zlac8030l_ros_driver_core",
+    ext_modules=cythonize([Extension("driver_core", ["driver_core.pyx"])]),
+)
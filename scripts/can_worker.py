@@ -0,0 +1,243 @@
+"""
+BSD 3-Clause License
+Copyright (c) 2022, Mohamed Abdelkader Zahana
+All rights reserved.
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its
+   contributors may be used to endorse or promote products derived from
+   this software without specific prior written permission.
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import multiprocessing as mp
+import queue
+from time import monotonic
+
+import numpy as np
+
+from batch_controller import BatchMotorController
+from loop_rate import HybridRate
+from pid import VecPID
+
+# The ROS process is multi-threaded, so do not fork it
+_mp = mp.get_context("spawn")
+
+# Layout of CanWorker.state, one entry per wheel in each slice
+VEL = slice(0, 4)            # Current speed [rpm]
+CURRENT = slice(4, 8)        # Motor current [A]
+VOLTAGE = slice(8, 12)       # Voltage [V]
+ERROR_CODE = slice(12, 16)   # Last error code
+TARGET_CURRENT = slice(16, 20) # Target current [mA], torque mode only
+STATE_SIZE = 20
+
+
+class CanWorker(_mp.Process):
+    """Runs the CAN side of the driver in its own process, so that CAN I/O and
+    the ROS callbacks/publishers do not compete for the same GIL.
+
+    The worker owns the BatchMotorController and runs the wheel control loop.
+    Wheel states are written to the shared `state` array, which the ROS
+    process reads without locking. Target wheel speeds come in through the
+    `targets` queue.
+    """
+
+    def __init__(self, node_ids, controller_kwargs, loop_rate=100.0, state_decim=10, cmd_timeout=0.1,
+                 torque_mode=False, kp=200, ki=10, kd=0):
+        """
+        Parameters
+        --
+        @param node_ids CAN node IDs, in wheel order
+        @param controller_kwargs Keyword arguments of BatchMotorController
+        @param loop_rate Control loop rate [Hz]
+        @param state_decim Motor diagnostics are read every state_decim iterations
+        @param cmd_timeout Targets older than this [s] are replaced by zero
+        @param torque_mode If True, wheel speeds are controlled by a PID on the motor current
+        @param kp, ki, kd Velocity PID gains, torque mode only
+        """
+        super().__init__(name="can_worker", daemon=True)
+        self._node_ids = [int(n) for n in node_ids]
+        self._controller_kwargs = controller_kwargs
+        self._loop_rate = loop_rate
+        self._state_decim = state_decim
+        self._cmd_timeout = cmd_timeout
+        self._torque_mode = torque_mode
+        self._kp = kp
+        self._ki = ki
+        self._kd = kd
+
+        # Wheel states shared with the ROS process, see the layout above
+        self.state = _mp.RawArray('d', STATE_SIZE)
+        # Target wheel speeds [rpm], put by the ROS process
+        self.targets = _mp.Queue()
+        # (kind, message) errors, to be logged by the ROS process throttled per kind
+        self.errors = _mp.Queue(maxsize=10)
+        # None once the CAN network is up, otherwise the error message
+        self.status = _mp.Queue()
+        self._stop_event = _mp.Event()
+
+    def setTargets(self, target_rpm):
+        """Sends new target wheel speeds [rpm] to the worker"""
+        self.targets.put(target_rpm)
+
+    def waitReady(self):
+        """Blocks until the worker has created the CAN network
+
+        @return None on success, otherwise the error message
+        """
+        while self.is_alive():
+            try:
+                return self.status.get(timeout=0.5)
+            except queue.Empty:
+                pass
+        # The worker may have reported its error just before exiting
+        try:
+            return self.status.get(timeout=0.5)
+        except queue.Empty:
+            return "CAN worker exited"
+
+    def stop(self):
+        """Stops the control loop and disconnects the CAN network"""
+        self._stop_event.set()
+        self.join(timeout=2.0)
+
+    def _reportError(self, kind, msg):
+        """Queues an error for the ROS process. `kind` identifies the error
+        site (and node), each kind is throttled separately"""
+        try:
+            self.errors.put_nowait((kind, msg))
+        except queue.Full:
+            pass
+
+    def run(self):
+        try:
+            self._network = BatchMotorController(**self._controller_kwargs)
+        except Exception as e:
+            self.status.put(str(e))
+            return
+        self.status.put(None)
+
+        self._state = np.frombuffer(self.state, dtype=np.float64)
+        self._vel_pid = VecPID(kp=self._kp, ki=self._ki, kd=self._kd, n=len(self._node_ids))
+        self._target_rpm = np.zeros(len(self._node_ids))
+        self._last_target_t = monotonic()
+        self._last_ctrl_t = monotonic()
+
+        parent = _mp.parent_process()
+        rate = HybridRate(self._loop_rate)
+        i = 0
+        try:
+            while not self._stop_event.is_set() and parent.is_alive():
+                self._updateTargets()
+
+                self._readVelocities()
+
+                self._applyControls()
+
+                if i % self._state_decim == 0:
+                    self._readMotorState()
+                i += 1
+
+                rate.sleep()
+        finally:
+            self._network.disconnectNetwork()
+
+    def _updateTargets(self):
+        """Takes the latest targets from the queue; zeroes them on timeout"""
+        while True:
+            try:
+                self._target_rpm = self.targets.get_nowait()
+                self._last_target_t = monotonic()
+            except queue.Empty:
+                break
+
+        if monotonic() - self._last_target_t > self._cmd_timeout:
+            self._target_rpm = np.zeros(len(self._node_ids))
+
+    def _readVelocities(self):
+        """Reads the wheel speeds into the shared state"""
+        # Only connection-level failures raise; per-wheel failures are flagged
+        try:
+            vels = self._network.getVelocityBatch(node_ids=self._node_ids)
+        except Exception as e:
+            self._reportError("get_vel", "[CanWorker] Error in getting wheel velocity: %s. Check driver connection" % e)
+            return
+
+        state = self._state
+        vel_start = VEL.start
+        for i, node_id in enumerate(self._node_ids):
+            ok, value = vels[node_id]
+            if ok:
+                state[vel_start + i] = value
+            else:
+                self._reportError(("get_vel", node_id), "[CanWorker] No velocity reading from node %s. Check driver connection" % node_id)
+
+    def _applyControls(self):
+        """
+        Computes and applyies control signals based on the control mode (velocity vs. torque)
+        """
+        if (self._torque_mode):
+            now = monotonic()
+            dt = now - self._last_ctrl_t
+            self._last_ctrl_t = now
+
+            target_current = self._vel_pid.step(self._target_rpm, self._state[VEL], dt)
+            self._state[TARGET_CURRENT] = target_current
+
+            try:
+                oks = self._network.setTorqueBatch(self._node_ids, target_current)
+            except Exception as e:
+                self._reportError("set_torque", "[CanWorker] Error in setting wheel torque: %s" % e)
+                return
+
+            for node_id, ok in oks.items():
+                if not ok:
+                    self._reportError(("set_torque", node_id), "[CanWorker] Node %s did not confirm the target torque" % node_id)
+        else:
+            # Send target velocity to the controller
+            try:
+                oks = self._network.setVelocityBatch(self._node_ids, self._target_rpm)
+            except Exception as e:
+                self._reportError("set_vel", "[CanWorker] Error in setting wheel velocity: %s" % e)
+                return
+
+            for node_id, ok in oks.items():
+                if not ok:
+                    self._reportError(("set_vel", node_id), "[CanWorker] Node %s did not confirm the target velocity" % node_id)
+
+    def _readMotorState(self):
+        """Reads voltage, motor current and error code of each wheel.
+        Values that cannot be read keep their last value
+        """
+        for i, node_id in enumerate(self._node_ids):
+            # Voltage
+            try:
+                self._state[VOLTAGE.start + i] = self._network.getVoltage(node_id)['value']
+            except:
+                pass
+
+            # Motor current
+            try:
+                self._state[CURRENT.start + i] = self._network.getMotorCurrent(node_id)['value']
+            except:
+                pass
+
+            # Error Code
+            try:
+                self._state[ERROR_CODE.start + i] = self._network.getErrorCode(node_id)['value']
+            except:
+                pass
@@ -28,6 +28,77 @@ import logging
 from math import *
 import time
 
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional; fall back to plain Python functions
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda f: f
+
+# Wheel speed unit conversions, rpm <-> rad/s
+_RPM2RPS = pi/30.0
+_RPS2RPM = 30.0/pi
+
+
+@njit(cache=True, fastmath=True)
+def _wheel_vel(v, w, wheel_radius, track_width):
+    """Left and right wheel speeds [rad/s], see DiffDrive.calcWheelVel"""
+    wr = 1/wheel_radius *(v + w * track_width/2)
+    wl = 1/wheel_radius *(v - w * track_width/2)
+    return (wl, wr)
+
+
+@njit(cache=True, fastmath=True)
+def _integrate_odom(x, y, yaw, wl, wr, wheel_radius, track_width, dt):
+    """One odometry integration step, see DiffDrive.calcRobotOdom
+
+    @return (x, y, yaw, x_dot, y_dot, v, w)
+    """
+    angular_vel = wheel_radius/track_width * (wr - wl)
+    linear_vel = (wheel_radius/2)*(wr + wl)
+
+    angular_pos = yaw + angular_vel * dt
+
+    x_dot = linear_vel * cos(angular_pos)
+    y_dot = linear_vel * sin(angular_pos)
+
+    return (x + dt*x_dot, y + dt*y_dot, angular_pos, x_dot, y_dot, linear_vel, angular_vel)
+
+
+@njit(cache=True, fastmath=True)
+def _limit_and_compute(vx, w, current_v, current_w, dt, max_lin_accel, max_ang_accel, max_vx, max_w, wheel_radius, track_width):
+    """Applies acceleration and velocity limits to a (vx, w) command and
+    converts it to left/right wheel speeds
+
+    Parameters
+    --
+    @param vx, w Commanded linear [m/s] and angular [rad/s] velocities
+    @param current_v, current_w Current robot velocities from odometry
+    @param dt Time since the last command [s]
+
+    Returns
+    --
+    @return wl_rpm Left wheel velocity in rpm
+    @return wr_rpm Right wheel velocity in rpm
+    """
+    # Largest velocity change allowed by the acceleration constraints
+    dv_max = dt*max_lin_accel
+    dw_max = dt*max_ang_accel
+
+    # Clamp the command to the reachable range around the current velocity,
+    # then to the velocity limits
+    v_d = max(current_v - dv_max, min(current_v + dv_max, vx))
+    w_d = max(current_w - dw_max, min(current_w + dw_max, w))
+
+    v_d = max(-max_vx, min(max_vx, v_d))
+    w_d = max(-max_w, min(max_w, w_d))
+
+    # Compute wheels velocity commands [rad/s], then convert to rpm
+    (wl, wr) = _wheel_vel(v_d, w_d, wheel_radius, track_width)
+    return (wl * _RPS2RPM, wr * _RPS2RPM)
+
 
 class DiffDrive:
     """Differential drive kinematics for 4-wheel robot
@@ -37,18 +108,22 @@ class DiffDrive:
     """
 
     def __init__(self, wheel_radius, track_width):
-        self._wheel_radius = wheel_radius
-        self._track_width = track_width 
-        self._odom = {'x':0,'y':0,'yaw':0,'x_dot':0,'y_dot':0,'v':0,'w':0}
+        self._wheel_radius = float(wheel_radius)
+        self._track_width = float(track_width)
+        self._odom = {'x':0.0,'y':0.0,'yaw':0.0,'x_dot':0.0,'y_dot':0.0,'v':0.0,'w':0.0}
 
         self._fl_pos = 0 # Front left encoder position
         self._bl_pos = 0 # Back left
         self._br_pos = 0 # Back right
         self._fr_pos = 0 # Front right
-        self._fl_vel = 0 # Front left wheel angular velocity in rad/s
-        self._bl_vel = 0 
-        self._br_vel = 0
-        self._fr_vel = 0
+        self._fl_vel = 0.0 # Front left wheel angular velocity in rad/s
+        self._bl_vel = 0.0
+        self._br_vel = 0.0
+        self._fr_vel = 0.0
+
+        # Compile the jitted kinematics now rather than in the control loop
+        _wheel_vel(0.0, 0.0, self._wheel_radius, self._track_width)
+        _integrate_odom(0.0, 0.0, 0.0, 0.0, 0.0, self._wheel_radius, self._track_width, 0.0)
 
     def calcWheelVel(self,v,w):
         """Calculates the left and right wheel speeds in rad/s from vx and w
@@ -63,9 +138,7 @@ class DiffDrive:
         @return wl Left wheel velocity in rad/s
         @return wr Right wheel velocity in rad/s
         """
-        wr = 1/self._wheel_radius *(v + w * self._track_width/2)
-        wl = 1/self._wheel_radius *(v - w * self._track_width/2)
-        return (wl,wr)
+        return _wheel_vel(v, w, self._wheel_radius, self._track_width)
   
     def calcRobotOdom(self, dt):
         """calculates linear and angular states from the left and right wheel speeds
@@ -86,29 +159,23 @@ class DiffDrive:
 
 
 
-        angular_vel = self._wheel_radius/self._track_width * (wr - wl)
-        linear_vel = (self._wheel_radius/2)*(wr + wl)
-
-        angular_pos = self._odom['yaw'] + angular_vel * dt
-
-
-        x_dot = linear_vel * cos(angular_pos)
-        y_dot = linear_vel * sin(angular_pos)
+        (x, y, yaw, x_dot, y_dot, v, w) = _integrate_odom(self._odom['x'], self._odom['y'], self._odom['yaw'],
+                                                           wl, wr, self._wheel_radius, self._track_width, dt)
 
         # Update odometry
-        self._odom['x']= self._odom['x'] + dt* x_dot
-        self._odom['y']= self._odom['y'] + dt* y_dot
-        self._odom['yaw'] = angular_pos
+        self._odom['x'] = x
+        self._odom['y'] = y
+        self._odom['yaw'] = yaw
 
         self._odom['x_dot'] = x_dot
         self._odom['y_dot'] = y_dot
 
-        self._odom['v'] = linear_vel
-        self._odom['w'] = angular_vel
+        self._odom['v'] = v
+        self._odom['w'] = w
 
         return self._odom
 
     def resetOdom(self):
         """Reset Odom to origin
         """
-        self._odom = {'x':0,'y':0,'yaw':0,'x_dot':0,'y_dot':0,'v':0,'w':0}
\ No newline at end of file
+        self._odom = {'x':0.0,'y':0.0,'yaw':0.0,'x_dot':0.0,'y_dot':0.0,'v':0.0,'w':0.0}
\ No newline at end of file
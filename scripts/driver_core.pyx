@@ -0,0 +1,36 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+"""
+Compiled inner loop of the wheel velocity controller, see pid.VecPID.step
+
+Build with `python3 scripts/build_driver_core.py build_ext --inplace`.
+"""
+
+
+cpdef void step(double[::1] cur, double[::1] tgt, double[::1] integ, double[::1] last_err,
+                double[::1] out_current, double kp, double ki, double kd, double max_int, double dt):
+    """One PID update for all wheels
+
+    Parameters
+    --
+    @param cur, tgt Current and target wheel speeds
+    @param integ, last_err PID integral part and last error, updated in place
+    @param out_current Control output, written in place
+    @param kp, ki, kd PID gains
+    @param max_int Maximum integrator magnitude
+    @param dt Time since the last update [s]
+    """
+    cdef Py_ssize_t i
+    cdef double err, it
+    for i in range(cur.shape[0]):
+        err = tgt[i] - cur[i]
+
+        # Integral part
+        it = integ[i] + ki*err*dt
+        if it > max_int:
+            it = max_int
+        elif it < -max_int:
+            it = -max_int
+        integ[i] = it
+
+        out_current[i] = kp*err + it + kd*(err - last_err[i])/dt
+        last_err[i] = err
@@ -30,84 +30,110 @@ ROS driver for the ZLAC8030L motor controller
 Reuquires: ZALAC8030L_CAN_controller, https://github.com/mzahana/ZLAC8030L_CAN_controller
 """
 
-from time import time
+import math
+import queue
+from time import monotonic
+import numpy as np
 import rospy
 import tf
 from geometry_msgs.msg import Twist
 from std_msgs.msg import Float64
 from nav_msgs.msg import Odometry
-from ZLAC8030L_CAN_controller.canopen_controller import MotorController
-from differential_drive import DiffDrive
-from pid import PID
+from can_worker import CanWorker, VEL, CURRENT, VOLTAGE, ERROR_CODE, TARGET_CURRENT
+from differential_drive import DiffDrive, _limit_and_compute, _RPM2RPS
+from loop_rate import HybridRate
 from zlac8030l_ros.msg import State
 
+# Fixed wheel order used to index all the per-wheel arrays
+WHEELS = ("fl", "bl", "br", "fr")
+
 class Driver:
     def __init__(self):
-        self._can_channel = rospy.get_param("~can_channel", "can0")
-        self._bus_type = rospy.get_param("~bus_type", "socketcan")
-        self._bitrate = rospy.get_param("~bitrate", 500000)
-        self._eds_file = rospy.get_param("~eds_file","")
-        # self._wheel_ids = rospy.get_param("~wheel_ids", []) # TODO needs checking
-        self._wheel_ids = {"fl":1, "bl":2, "br":3, "fr":4}
-        self._flip_direction = {"fl": -1, "bl": -1, "br": 1, "fr": 1}
+        # Fetch the whole private namespace in one parameter server call
+        params = rospy.get_param("~", {})
+
+        self._can_channel = params.get("can_channel", "can0")
+        self._bus_type = params.get("bus_type", "socketcan")
+        self._bitrate = params.get("bitrate", 500000)
+        self._eds_file = params.get("eds_file", "")
+        # self._wheel_ids = params.get("wheel_ids", []) # TODO needs checking
+        # CAN node ID and direction of each wheel, in WHEELS order
+        self._node_ids = np.array([1, 2, 3, 4], dtype=np.int32)
+        self._flip = np.array([-1, -1, 1, 1], dtype=np.float64)
+        # Direction flip and rpm -> rad/s conversion in one factor, used for odom
+        self._odom_scale = self._flip * _RPM2RPS
 
         # Velocity vs. Troque modes
-        self._torque_mode = rospy.get_param("~torque_mode", False)
+        self._torque_mode = params.get("torque_mode", False)
 
-        self._kp = rospy.get_param("~vel_kp", 200)
-        self._ki = rospy.get_param("~vel_ki", 10)
-        self._kd = rospy.get_param("~vel_kd", 0)
-        # Create PIDs, one for each wheel
-        self._vel_pids = {"fl":PID(kp=self._kp, ki=self._ki, kd=self._kd), "bl":PID(kp=self._kp, ki=self._ki, kd=self._kd), "br":PID(kp=self._kp, ki=self._ki, kd=self._kd), "fr":PID(kp=self._kp, ki=self._ki, kd=self._kd)}
+        self._kp = params.get("vel_kp", 200)
+        self._ki = params.get("vel_ki", 10)
+        self._kd = params.get("vel_kd", 0)
 
-        
+        # Per-wheel states below are arrays in WHEELS order
         # Stores current wheel speeds [rpm]
-        self._current_whl_rpm = {"fl": 0.0, "bl": 0.0, "br": 0.0, "fr": 0.0}
+        self._current_whl_rpm = np.zeros(4)
         # Target RPM
-        self._target_whl_rpm = {"fl": 0.0, "bl": 0.0, "br": 0.0, "fr": 0.0}
-        # Target torque; when slef._control_mode="torque"
-        self._target_current = {"fl": 0.0, "bl": 0.0, "br": 0.0, "fr": 0.0}
+        self._target_whl_rpm = np.zeros(4)
         
-        self._wheel_radius = rospy.get_param("~wheel_radius", 0.194)
+        self._wheel_radius = params.get("wheel_radius", 0.194)
 
-        self._track_width = rospy.get_param("~track_width", 0.8)
+        self._track_width = params.get("track_width", 0.8)
 
-        self._max_vx = rospy.get_param("~max_vx", 2.0)
-        self._max_w = rospy.get_param("~max_w", 1.57)
+        self._max_vx = float(params.get("max_vx", 2.0))
+        self._max_w = float(params.get("max_w", 1.57))
 
         # Max linear accelration [m/s^2] >0
-        self._max_lin_accel = rospy.get_param("~max_lin_accel", 10)
+        self._max_lin_accel = float(params.get("max_lin_accel", 10))
         # Max angular accelration [rad/s^2] >0
-        self._max_ang_accel = rospy.get_param("~max_ang_accel", 15)
+        self._max_ang_accel = float(params.get("max_ang_accel", 15))
 
-        self._odom_frame = rospy.get_param("~odom_frame", "odom_link")
-        self._robot_frame = rospy.get_param("~robot_frame", "base_link")
+        self._odom_frame = params.get("odom_frame", "odom_link")
+        self._robot_frame = params.get("robot_frame", "base_link")
 
-        self._loop_rate = rospy.get_param("~loop_rate", 100.0)
+        self._loop_rate = params.get("loop_rate", 100.0)
 
-        self._cmd_timeout = rospy.get_param("~cmd_timeout", 0.1)
+        # Motor state is diagnostic data; publish it slower than the control loop
+        self._motor_state_rate = params.get("motor_state_rate", 10.0)
+        self._state_decim = max(1, int(round(self._loop_rate / self._motor_state_rate)))
+
+        self._cmd_timeout = params.get("cmd_timeout", 0.1)
 
         self._diff_drive = DiffDrive(self._wheel_radius, self._track_width)
 
         # last time stamp. Used in odometry calculations
-        self._last_odom_dt = time()
+        self._last_odom_dt = monotonic()
 
         # Last time a velcoity command was received
-        self._last_cmd_t = time()
+        self._last_cmd_t = monotonic()
+
+        # Compile the jitted cmd_vel math at startup, not in the first callback
+        _limit_and_compute(0.0, 0.0, 0.0, 0.0, 0.0, self._max_lin_accel, self._max_ang_accel,
+                           self._max_vx, self._max_w, self._diff_drive._wheel_radius, self._diff_drive._track_width)
 
         # If True, odom TF will be published
-        self._pub_tf = rospy.get_param("~pub_tf", False)
+        self._pub_tf = params.get("pub_tf", False)
+        # Odom TF publish rate [Hz], independent of the loop rate
+        self._tf_rate = params.get("tf_rate", 50.0)
 
 
-        try:
-            if (self._torque_mode):
-                mode='torque'
-            else:
-                 mode='velocity'   
-            self._network = MotorController(channel=self._can_channel, bustype=self._bus_type, bitrate=self._bitrate, node_ids=None, debug=True, eds_file=self._eds_file, mode=mode)
-        except Exception as e:
-            rospy.logerr("Could not create CAN network object. Error: %s", e)
+        if (self._torque_mode):
+            mode='torque'
+        else:
+             mode='velocity'   
+        # CAN I/O and the wheel control loop run in a separate process
+        controller_kwargs = dict(channel=self._can_channel, bustype=self._bus_type, bitrate=self._bitrate, node_ids=None, debug=True, eds_file=self._eds_file, mode=mode)
+        self._worker = CanWorker(self._node_ids, controller_kwargs, loop_rate=self._loop_rate, state_decim=self._state_decim,
+                                 cmd_timeout=self._cmd_timeout, torque_mode=self._torque_mode, kp=self._kp, ki=self._ki, kd=self._kd)
+        self._worker.start()
+        err = self._worker.waitReady()
+        if err is not None:
+            rospy.logerr("Could not create CAN network object. Error: %s", err)
             exit(0)
+        # Last time each kind of worker error was logged
+        self._worker_err_t = {}
+        # Zero-copy view of the wheel states written by the worker
+        self._shared_state = np.frombuffer(self._worker.state, dtype=np.float64)
 
         rospy.logwarn("\n ** cmd_vel must be published at rate more than %s Hz ** \n", 1/self._cmd_timeout)
 
@@ -119,281 +145,217 @@ class Driver:
         self._vel_pub = rospy.Publisher("forward_vel", Float64, queue_size=10)
 
         self._motor_state_pub_dict = {}
-        for wheel in ["fl", "bl", "br", "fr"]:
+        for wheel in WHEELS:
             self._motor_state_pub_dict[wheel] = rospy.Publisher(wheel+"_motor/state", State, queue_size=10)
 
+        # Messages are allocated once and updated in place before publishing
+        self._odom_msg = Odometry()
+        self._odom_msg.header.frame_id = self._odom_frame
+        self._odom_msg.child_frame_id = self._robot_frame
+        # pose covariance
+        self._odom_msg.pose.covariance[0] = 1000.0 # x-x
+        self._odom_msg.pose.covariance[7] = 1000.0 # y-y
+        self._odom_msg.pose.covariance[14] = 1000.0 # z-z
+        self._odom_msg.pose.covariance[21] = 1000.0 # roll
+        self._odom_msg.pose.covariance[28] = 1000.0 # pitch
+        self._odom_msg.pose.covariance[35] = 1000.0 # yaw
+        # twist covariance
+        self._odom_msg.twist.covariance[0] = 0.1 # vx
+        self._odom_msg.twist.covariance[7] = 0.1 # vx
+        self._odom_msg.twist.covariance[14] = 1000.0 # vz
+        self._odom_msg.twist.covariance[21] = 1000.0 # omega_x
+        self._odom_msg.twist.covariance[28] = 1000.0 # omega_y
+        self._odom_msg.twist.covariance[35] = 0.1 # omega_z
+
+        self._vel_msg = Float64()
+
+        self._state_msgs = {}
+        for i, t in enumerate(WHEELS):
+            self._state_msgs[t] = State()
+            self._state_msgs[t].node_id = int(self._node_ids[i])
+
         # ------------------- Services ----------------#
 
         # TF broadcaster
         self._tf_br = tf.TransformBroadcaster()
+        # Latest (x, y, qz, qw, stamp) computed by pubOdom, and the stamp of the last sent TF
+        self._last_odom_state = None
+        self._last_tf_stamp = None
+        if self._pub_tf:
+            rospy.Timer(rospy.Duration(1.0/self._tf_rate), self._pubTfCb)
 
         rospy.loginfo("** Driver initialization is done **\n")
 
-    def rpmToRps(self, rpm):
-        return rpm / 9.5493
-
-    def rpsToRpm(self, rad):
-        return rad * 9.5493
-
-    def applyControls(self):
-        """
-        Computes and applyies control signals based on the control mode (velocity vs. torque)
-        """
-        if (self._torque_mode):
-            try:
-                err_rpm = {"fr":0, "fl":0, "br":0, "bl":0}
-                for t in ["fl", "bl", "br", "fr"]:
-                    v_dict = self._network.getVelocity(node_id=self._wheel_ids[t])
-                    vel = v_dict['value']* self._flip_direction[t] # flipping is required for odom
-                    self._current_whl_rpm[t] = v_dict['value']
-
-                    err_rpm[t] = self._target_whl_rpm[t] - self._current_whl_rpm[t]
-                    self._target_current[t] = self._vel_pids["fr"].update(err_rpm[t])
-
-            except Exception as e:
-                rospy.logerr_throttle(1, "[applyControls] Error in getting wheel velocity: %s. Check driver connection", e)
-
-        
-        
-            try:
-                for t in ["fl", "bl", "br", "fr"]:
-                    self._network.setTorque( node_id=self._wheel_ids[t], current_mA=self._target_current[t])
-            except Exception as e:
-                rospy.logerr_throttle(1, "[applyControls] Error in setting wheel torque: %s", e)
-        else:
-            # Send target velocity to the controller
-            try:
-                for t in ["fl", "bl", "br", "fr"]:
-                    self._network.setVelocity(node_id=self._wheel_ids[t], vel=self._target_whl_rpm[t])
-                
-            except Exception as e:
-                rospy.logerr_throttle(1, "[applyControls] Error in setting wheel velocity: %s", e)
-
-
-    
     def cmdVelCallback(self, msg):
-        sign_x = -1 if msg.linear.x <0 else 1
-        sign_w = -1 if msg.angular.z <0 else 1
-        
         vx = msg.linear.x
         w = msg.angular.z
 
-        # Initialize final commanded velocities,, after applying constraitns
-        v_d = vx
-        w_d = w
-
         # Limit velocity by acceleration
-        current_t = time()
+        current_t = monotonic()
         dt = current_t - self._last_cmd_t
         self._last_cmd_t = current_t
         odom = self._diff_drive.calcRobotOdom(dt)
-        current_v = odom['v']
-        current_w = odom['w']
-
-        # Figure out the max acceleration sign
-        dv = vx-current_v
-        abs_dv = abs(dv)
-        if (abs_dv > 0):
-            lin_acc = (abs_dv/dv)*self._max_lin_accel
-        else:
-            lin_acc = self._max_lin_accel
 
-        dw = w-current_w
-        abs_dw = abs(w-current_w)
-        if (abs_dw > 0):
-            ang_acc = dw/abs_dw * self._max_ang_accel
-        else:
-            ang_acc = self._max_ang_accel
-
-        # Maximum acceptable velocity given the acceleration constraints, and current velocity
-        max_v = current_v + dt*lin_acc
-        max_w = current_w + dt*ang_acc
-
-        # Compute & compare errors to deceide whether to scale down the desired velocity
-        # For linear vel
-        ev_d = abs(vx-current_v)
-        ev_max = abs(max_v - current_v)
-        if ev_d > ev_max:
-            v_d=max_v
-
-        # For angular vel
-        ew_d = abs(w-current_w)
-        ew_max = abs(max_w - current_w)
-        if ew_d > ew_max:
-            w_d = max_w
-
-        if (abs(v_d) > self._max_vx):
-            rospy.logwarn_throttle(1, "Commanded linear velocity %s is more than maximum magnitude %s", sign_x*vx, sign_x*self._max_vx)
-            v_d = sign_x * self._max_vx
-        if (abs(w_d) > self._max_w):
-            rospy.logwarn_throttle(1, "Commanded angular velocity %s is more than maximum magnitude %s", sign_w*w, sign_w*self._max_w)
-            w_d = sign_w * self._max_w
-
-        # Compute wheels velocity commands [rad/s]
-        (wl, wr) = self._diff_drive.calcWheelVel(v_d,w_d)
-
-        # TODO convert rad/s to rpm
-        wl_rpm = self.rpsToRpm(wl)
-        wr_rpm = self.rpsToRpm(wr)
-        self._target_whl_rpm["fl"] = wl_rpm * self._flip_direction["fl"]
-        self._target_whl_rpm["bl"] = wl_rpm * self._flip_direction["bl"]
-        self._target_whl_rpm["br"] = wr_rpm * self._flip_direction["br"]
-        self._target_whl_rpm["fr"] = wr_rpm * self._flip_direction["fr"]
-
-        # Apply control in the main loop
-        
+        if (abs(vx) > self._max_vx):
+            rospy.logwarn_throttle(1, "Commanded linear velocity %s is more than maximum magnitude %s", abs(vx), self._max_vx)
+        if (abs(w) > self._max_w):
+            rospy.logwarn_throttle(1, "Commanded angular velocity %s is more than maximum magnitude %s", abs(w), self._max_w)
 
-        
+        (wl_rpm, wr_rpm) = _limit_and_compute(vx, w, odom['v'], odom['w'], dt,
+                                              self._max_lin_accel, self._max_ang_accel, self._max_vx, self._max_w,
+                                              self._diff_drive._wheel_radius, self._diff_drive._track_width)
+        self._target_whl_rpm = np.array([wl_rpm, wl_rpm, wr_rpm, wr_rpm]) * self._flip
 
-    def pubOdom(self):
+        # Control is applied by the CAN worker
+        self._worker.setTargets(self._target_whl_rpm)
+
+
+    def _refreshWheelState(self):
+        """Reads the wheel speeds from the CAN worker once per loop iteration.
+        Updates _current_whl_rpm and the wheel velocities used by the odometry
+        """
+        self._current_whl_rpm = self._shared_state[VEL].copy()
+        # flipping is required for odom
+        whl_rps = self._current_whl_rpm * self._odom_scale
+        self._diff_drive._fl_vel = whl_rps[0]
+        self._diff_drive._bl_vel = whl_rps[1]
+        self._diff_drive._br_vel = whl_rps[2]
+        self._diff_drive._fr_vel = whl_rps[3]
+
+    def pubOdom(self, time_stamp):
         """Computes & publishes odometry msg
+
+        @param time_stamp rospy.Time of the current loop iteration
         """
-        try:
-            for t in ["fl", "bl", "br", "fr"]:
-
-                v_dict = self._network.getVelocity(node_id=self._wheel_ids[t])
-                vel = v_dict['value']* self._flip_direction[t] # flipping is required for odom
-                self._current_whl_rpm[t] = v_dict['value']
-                if t=="fl":
-                    self._diff_drive._fl_vel = self.rpmToRps(vel)
-                if t=="fr":
-                    self._diff_drive._fr_vel = self.rpmToRps(vel)
-                if t=="bl":
-                    self._diff_drive._bl_vel = self.rpmToRps(vel)
-                if t=="br":
-                    self._diff_drive._br_vel = self.rpmToRps(vel)
-        except Exception as e :
-            rospy.logerr_throttle(1, " Error in pubOdom: %s. Check driver connection", e)
-            #rospy.logerr_throttle(1, "Availabled nodes = %s", self._network._network.scanner.nodes)
-
-        now = time()
+        now = monotonic()
 
         dt= now - self._last_odom_dt
         self._last_odom_dt = now
 
         odom = self._diff_drive.calcRobotOdom(dt)
 
-        msg = Odometry()
+        msg = self._odom_msg
 
-        time_stamp = rospy.Time.now()
         msg.header.stamp = time_stamp
-        msg.header.frame_id=self._odom_frame
-        msg.child_frame_id = self._robot_frame
 
         msg.pose.pose.position.x = odom["x"]
         msg.pose.pose.position.y = odom["y"]
-        msg.pose.pose.position.z = 0.0
-        odom_quat = tf.transformations.quaternion_from_euler(0, 0, odom['yaw'])
-        msg.pose.pose.orientation.x = odom_quat[0]
-        msg.pose.pose.orientation.y = odom_quat[1]
-        msg.pose.pose.orientation.z = odom_quat[2]
-        msg.pose.pose.orientation.w = odom_quat[3]
-        # pose covariance
-        msg.pose.covariance[0] = 1000.0 # x-x
-        msg.pose.covariance[7] = 1000.0 # y-y
-        msg.pose.covariance[14] = 1000.0 # z-z
-        msg.pose.covariance[21] = 1000.0 # roll
-        msg.pose.covariance[28] = 1000.0 # pitch
-        msg.pose.covariance[35] = 1000.0 # yaw
+        # Roll and pitch are always zero, so the quaternion reduces to a rotation about z
+        half_yaw = 0.5*odom['yaw']
+        qz = math.sin(half_yaw)
+        qw = math.cos(half_yaw)
+        msg.pose.pose.orientation.z = qz
+        msg.pose.pose.orientation.w = qw
 
         # For twist, velocities are w.r.t base_link. So, only x component (forward vel) is used
         msg.twist.twist.linear.x = odom['v']
-        msg.twist.twist.linear.y = 0 #odom['y_dot']
         msg.twist.twist.angular.z = odom['w']
-        msg.twist.covariance[0] = 0.1 # vx
-        msg.twist.covariance[7] = 0.1 # vx
-        msg.twist.covariance[14] = 1000.0 # vz
-        msg.twist.covariance[21] = 1000.0 # omega_x
-        msg.twist.covariance[28] = 1000.0 # omega_y
-        msg.twist.covariance[35] = 0.1 # omega_z
         
         self._odom_pub.publish(msg)
-        if self._pub_tf:
-            # Send TF
-            self._tf_br.sendTransform((odom['x'],odom['y'],0),odom_quat,time_stamp,self._robot_frame,self._odom_frame)
-
-        msg = Float64()
-        msg.data = odom["v"] # Forward velocity
-        self._vel_pub.publish(msg)
-
-    def pubMotorState(self):
-        for t in ["fl", "bl", "br", "fr"]:
-            msg = State()
-            msg.header.stamp = rospy.Time.now()
-            msg.node_id = self._wheel_ids[t]
-            
+        # TF is sent by _pubTfCb
+        self._last_odom_state = (odom['x'], odom['y'], qz, qw, time_stamp)
+
+        self._vel_msg.data = odom["v"] # Forward velocity
+        self._vel_pub.publish(self._vel_msg)
+
+    def _pubTfCb(self, event):
+        """Timer callback, sends the odom TF from the latest odometry"""
+        odom_state = self._last_odom_state
+        if odom_state is None:
+            return
+        (x, y, qz, qw, time_stamp) = odom_state
+        # Do not send the same transform twice
+        if time_stamp == self._last_tf_stamp:
+            return
+        self._last_tf_stamp = time_stamp
+        self._tf_br.sendTransform((x,y,0),(0.0,0.0,qz,qw),time_stamp,self._robot_frame,self._odom_frame)
+
+    def pubMotorState(self, time_stamp):
+        # Motor readings are polled by the CAN worker
+        state = self._shared_state
+        for i, t in enumerate(WHEELS):
+            msg = self._state_msgs[t]
+            msg.header.stamp = time_stamp
+
             # Voltage
-            try:
-                volts_dict = self._network.getVoltage(self._wheel_ids[t])
-                volts = volts_dict['value']
-                msg.voltage = volts
-            except:
-                pass
+            msg.voltage = state[VOLTAGE.start + i]
 
             # Target current in mA
-            msg.target_current_mA = self._target_current[t]
+            msg.target_current_mA = state[TARGET_CURRENT.start + i]
             # Target current in A
-            msg.target_current_A = self._target_current[t]/1000.0
-            
+            msg.target_current_A = state[TARGET_CURRENT.start + i]/1000.0
+
             # Motor current
-            try:
-                curr_dict = self._network.getMotorCurrent(self._wheel_ids[t])
-                curr = curr_dict['value']
-                msg.current = curr
-            except:
-                pass
+            msg.current = state[CURRENT.start + i]
 
             # Error Code
-            try:
-                err_dict = self._network.getErrorCode(self._wheel_ids[t])
-                code = err_dict['value']
-                msg.error_code = code
-            except:
-                pass
+            msg.error_code = int(state[ERROR_CODE.start + i])
 
             # Current speed, rpm
-            try:
-                msg.actual_speed = self._current_whl_rpm[t]
-            except:
-                pass
+            msg.actual_speed = self._current_whl_rpm[i]
 
             # Target speed, rpm
-            try:
-                msg.target_speed = self._target_whl_rpm[t]
-            except:
-                pass
+            msg.target_speed = self._target_whl_rpm[i]
 
             self._motor_state_pub_dict[t].publish(msg)
 
+    def _logWorkerErrors(self):
+        """Logs the errors reported by the CAN worker, at most once per second per kind"""
+        while True:
+            try:
+                (kind, msg) = self._worker.errors.get_nowait()
+            except queue.Empty:
+                break
+            now = monotonic()
+            if now - self._worker_err_t.get(kind, float('-inf')) >= 1.0:
+                self._worker_err_t[kind] = now
+                rospy.logerr(msg)
+
+    def shutdown(self):
+        """Stops the CAN worker, which disconnects the CAN network"""
+        self._worker.stop()
 
     def mainLoop(self):
-        rate = rospy.Rate(self._loop_rate)
+        rate = HybridRate(self._loop_rate)
+        i = 0
 
         while not rospy.is_shutdown():
-            now = time()
+            now = monotonic()
+            # One ROS stamp per iteration, shared by all published messages
+            time_stamp = rospy.Time.now()
 
             dt = now - self._last_cmd_t
             if (dt > self._cmd_timeout):
                 # set zero velocity
-                for t in ["fl", "bl", "br", "fr"]:
-                    self._target_whl_rpm[t]=0.0
+                self._target_whl_rpm = np.zeros(4)
+
+            # Stale wheel speeds would make the odometry drift; stop instead.
+            # The launch file respawns the node
+            if not self._worker.is_alive():
+                self._logWorkerErrors()
+                rospy.logerr("CAN worker exited with code %s. Shutting down the driver", self._worker.exitcode)
+                rospy.signal_shutdown("CAN worker exited")
+                break
 
-            # Apply controls
-            self.applyControls()
+            # Read wheel speeds from the CAN worker
+            self._refreshWheelState()
+            self._logWorkerErrors()
 
             # Publish wheel odom
-            self.pubOdom()
-            # Publish Motors state
-            self.pubMotorState()
+            self.pubOdom(time_stamp)
+            # Publish Motors state, every _state_decim iterations
+            if i % self._state_decim == 0:
+                self.pubMotorState(time_stamp)
+            i += 1
             
             rate.sleep()
   
 
 if __name__ == "__main__":
     rospy.init_node("** Motor driver node started ** \n",anonymous=True)
+    driver = Driver()
     try:
-        driver = Driver()
-
         driver.mainLoop()
     except rospy.ROSInterruptException:
-        driver._network.disconnectNetwork()
\ No newline at end of file
+        pass
+    driver.shutdown()
\ No newline at end of file
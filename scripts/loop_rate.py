@@ -0,0 +1,32 @@
+from time import monotonic, sleep
+
+
+class HybridRate:
+    def __init__(self, hz, slack=2e-4):
+        # Loop period [s]
+        self.period = 1.0/hz
+
+        # Time before the deadline [s] that is busy-waited instead of slept
+        self.slack = slack
+
+        self.deadline = monotonic() + self.period
+
+    def sleep(self):
+        '''
+        Sleeps until the next loop deadline. The OS sleep stops `slack` seconds
+        early and the rest is busy-waited, which keeps the period jitter in the
+        microseconds range. If the deadline was already missed, the missed
+        periods are skipped so the loop resyncs instead of falling behind.
+        '''
+        now = monotonic()
+        if now > self.deadline:
+            # Overrun, skip ahead to the next deadline on the period grid
+            self.deadline += (int((now - self.deadline)/self.period) + 1)*self.period
+
+        sleep_for = self.deadline - now - self.slack
+        if sleep_for > 0:
+            sleep(sleep_for)
+        while monotonic() < self.deadline:
+            pass
+
+        self.deadline += self.period
@@ -2,6 +2,12 @@ from time import time
 
 import numpy as np
 
+try:
+    # Optional compiled VecPID.step, see driver_core.pyx
+    import driver_core
+except ImportError:
+    driver_core = None
+
 
 class PID:
     def __init__(self, kp=0, ki=0, kd=0):
@@ -56,3 +62,65 @@ class PID:
         u_k = p+i+d
 
         return(u_k)
+
+
+class VecPID:
+    def __init__(self, kp=0, ki=0, kd=0, n=4):
+        # PID gains, shared by all channels
+        self.kp=kp
+        self.ki=ki
+        self.kd=kd
+
+        # Per-channel integral part and last error
+        self.integ = np.zeros(n)
+        self.last = np.zeros(n)
+
+        # Output buffer of step()
+        self.out = np.zeros(n)
+
+        # Maximum integrator value
+        self.MAX_INT=20000
+
+    def update(self, err, dt):
+        '''
+        Same as PID.update, for n independent channels at once
+
+        Params
+        --
+        - err [np.ndarray] Error signals = desired - actual, one per channel
+        - dt [float] Time since the last update [s]
+
+        Returns
+        --
+        - u_k [np.ndarray] control output signals
+        '''
+        # Integral part
+        self.integ = np.clip(self.integ + self.ki*err*dt, -self.MAX_INT, self.MAX_INT)
+
+        # Derivative part
+        d = self.kd*(err - self.last)/dt
+        self.last = err
+
+        return self.kp*err + self.integ + d
+
+    def step(self, target, current, dt):
+        '''
+        update() on err = target - current. Runs the compiled driver_core.step
+        when the extension is built, otherwise the NumPy implementation
+
+        Params
+        --
+        - target [np.ndarray] Desired signals, one per channel
+        - current [np.ndarray] Feedback signals, one per channel
+        - dt [float] Time since the last update [s]
+
+        Returns
+        --
+        - u_k [np.ndarray] control output signals
+        '''
+        if driver_core is None:
+            return self.update(target - current, dt)
+
+        driver_core.step(np.ascontiguousarray(current, dtype=np.float64), np.ascontiguousarray(target, dtype=np.float64),
+                         self.integ, self.last, self.out, self.kp, self.ki, self.kd, self.MAX_INT, dt)
+        return self.out
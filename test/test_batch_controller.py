@@ -0,0 +1,130 @@
+"""Checks of the batched expedited-SDO framing in batch_controller, without CAN hardware"""
+
+import os
+import queue
+import struct
+import sys
+import types
+import unittest
+from time import monotonic
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+try:
+    import ZLAC8030L_CAN_controller.canopen_controller
+except ImportError:
+    # Only the MotorController base class is needed; the batch API talks to the SDO clients
+    pkg = types.ModuleType("ZLAC8030L_CAN_controller")
+    mod = types.ModuleType("ZLAC8030L_CAN_controller.canopen_controller")
+    mod.MotorController = object
+    pkg.canopen_controller = mod
+    sys.modules["ZLAC8030L_CAN_controller"] = pkg
+    sys.modules["ZLAC8030L_CAN_controller.canopen_controller"] = mod
+
+import batch_controller
+from batch_controller import BatchMotorController, SDO_FRAME
+
+
+class StubSdoClient:
+    """Mimics the parts of canopen's SdoClient used by BatchMotorController"""
+    RESPONSE_TIMEOUT = 0.1
+
+    def __init__(self, reply=None):
+        self.responses = queue.Queue()
+        self.sent = []
+        # Function request bytes -> reply bytes, or None for a silent node
+        self.reply = reply
+
+    def send_request(self, request):
+        self.sent.append(request)
+        if self.reply is not None:
+            self.responses.put(self.reply(request))
+
+
+class StubNode:
+    def __init__(self, sdo):
+        self.sdo = sdo
+
+
+def uploadReply(value):
+    """Expedited upload reply carrying `value` for the requested index"""
+    def reply(request):
+        _, index, subindex, _ = SDO_FRAME.unpack(request)
+        return SDO_FRAME.pack(0x43, index, subindex, value)
+    return reply
+
+
+def downloadReply(request):
+    _, index, subindex, _ = SDO_FRAME.unpack(request)
+    return SDO_FRAME.pack(0x60, index, subindex, 0)
+
+
+def makeController(sdos):
+    controller = BatchMotorController.__new__(BatchMotorController)
+    controller._network = {node_id: StubNode(sdo) for node_id, sdo in sdos.items()}
+    return controller
+
+
+class TestGetVelocityBatch(unittest.TestCase):
+    def test_request_framing(self):
+        sdo = StubSdoClient(uploadReply(0))
+        makeController({1: sdo}).getVelocityBatch([1])
+        self.assertEqual(sdo.sent, [bytes([0x40, 0x6C, 0x60, 0, 0, 0, 0, 0])])
+
+    def test_values_per_node(self):
+        sdos = {1: StubSdoClient(uploadReply(-120)), 2: StubSdoClient(uploadReply(35))}
+        vels = makeController(sdos).getVelocityBatch([1, 2])
+        self.assertEqual(vels, {1: (True, -120), 2: (True, 35)})
+
+    def test_abort_is_not_ok(self):
+        abort = lambda request: SDO_FRAME.pack(0x80, 0x606C, 0, 0x06020000)
+        vels = makeController({1: StubSdoClient(abort)}).getVelocityBatch([1])
+        self.assertFalse(vels[1][0])
+
+    def test_wrong_index_is_not_ok(self):
+        other = lambda request: SDO_FRAME.pack(0x43, 0x6077, 0, 5)
+        vels = makeController({1: StubSdoClient(other)}).getVelocityBatch([1])
+        self.assertFalse(vels[1][0])
+
+    def test_stale_reply_is_dropped(self):
+        sdo = StubSdoClient(uploadReply(7))
+        sdo.responses.put(SDO_FRAME.pack(0x43, 0x606C, 0, 999))
+        vels = makeController({1: sdo}).getVelocityBatch([1])
+        self.assertEqual(vels[1], (True, 7))
+
+    def test_silent_nodes_share_one_timeout(self):
+        sdos = {n: StubSdoClient() for n in (1, 2, 3, 4)}
+        t = monotonic()
+        vels = makeController(sdos).getVelocityBatch([1, 2, 3, 4])
+        elapsed = monotonic() - t
+        self.assertEqual(vels, {n: (False, 0) for n in (1, 2, 3, 4)})
+        self.assertLess(elapsed, 2*StubSdoClient.RESPONSE_TIMEOUT)
+
+    def test_numpy_style_node_ids(self):
+        class Int32(int):
+            pass
+        vels = makeController({3: StubSdoClient(uploadReply(1))}).getVelocityBatch([Int32(3)])
+        self.assertEqual(list(vels), [3])
+
+
+class TestSetBatches(unittest.TestCase):
+    def test_velocity_framing(self):
+        sdo = StubSdoClient(downloadReply)
+        oks = makeController({1: sdo}).setVelocityBatch([1], [-2.9])
+        self.assertEqual(oks, {1: True})
+        self.assertEqual(sdo.sent, [bytes([0x23, 0xFF, 0x60, 0]) + struct.pack("<i", -2)])
+
+    def test_torque_framing_and_clamp(self):
+        sdos = {1: StubSdoClient(downloadReply), 2: StubSdoClient(downloadReply)}
+        oks = makeController(sdos).setTorqueBatch([1, 2], [-1500.0, 1e6])
+        self.assertEqual(oks, {1: True, 2: True})
+        self.assertEqual(sdos[1].sent, [bytes([0x2B, 0x71, 0x60, 0]) + struct.pack("<hH", -1500, 0)])
+        self.assertEqual(sdos[2].sent, [bytes([0x2B, 0x71, 0x60, 0]) + struct.pack("<hH", batch_controller.TARGET_TORQUE_LIMIT, 0)])
+
+    def test_unconfirmed_write_is_not_ok(self):
+        oks = makeController({1: StubSdoClient()}).setVelocityBatch([1], [10])
+        self.assertEqual(oks, {1: False})
+
+
+if __name__ == "__main__":
+    unittest.main()
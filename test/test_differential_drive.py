@@ -0,0 +1,69 @@
+"""Checks of the jitted kinematics in differential_drive against the original cmd_vel limiter"""
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from differential_drive import DiffDrive, _limit_and_compute, _RPS2RPM
+
+
+def referenceLimit(vx, w, current_v, current_w, dt, max_lin_accel, max_ang_accel, max_vx, max_w, wheel_radius, track_width):
+    """cmdVelCallback limiter as it was before the numba/branchless rewrite"""
+    sign_x = -1 if vx <0 else 1
+    sign_w = -1 if w <0 else 1
+    v_d = vx
+    w_d = w
+
+    dv = vx-current_v
+    abs_dv = abs(dv)
+    if (abs_dv > 0):
+        lin_acc = (abs_dv/dv)*max_lin_accel
+    else:
+        lin_acc = max_lin_accel
+
+    dw = w-current_w
+    abs_dw = abs(w-current_w)
+    if (abs_dw > 0):
+        ang_acc = dw/abs_dw * max_ang_accel
+    else:
+        ang_acc = max_ang_accel
+
+    max_v = current_v + dt*lin_acc
+    max_w_acc = current_w + dt*ang_acc
+
+    if abs(vx-current_v) > abs(max_v - current_v):
+        v_d = max_v
+    if abs(w-current_w) > abs(max_w_acc - current_w):
+        w_d = max_w_acc
+
+    if (abs(v_d) > max_vx):
+        v_d = sign_x * max_vx
+    if (abs(w_d) > max_w):
+        w_d = sign_w * max_w
+
+    (wl, wr) = DiffDrive(wheel_radius, track_width).calcWheelVel(v_d, w_d)
+    return (wl * _RPS2RPM, wr * _RPS2RPM)
+
+
+class TestLimitAndCompute(unittest.TestCase):
+    def test_matches_reference(self):
+        # Current velocities stay within the limits, as they do on the robot
+        rng = random.Random(0)
+        for _ in range(20000):
+            args = (rng.uniform(-3, 3), rng.uniform(-3, 3), rng.uniform(-2, 2), rng.uniform(-1.57, 1.57),
+                    rng.uniform(0, 0.5), 10.0, 15.0, 2.0, 1.57, 0.194, 0.6405)
+            expected = referenceLimit(*args)
+            result = _limit_and_compute(*args)
+            self.assertAlmostEqual(result[0], expected[0], places=9, msg=args)
+            self.assertAlmostEqual(result[1], expected[1], places=9, msg=args)
+
+    def test_zero_error_does_not_divide(self):
+        self.assertEqual(_limit_and_compute(1.0, 0.5, 1.0, 0.5, 0.01, 10.0, 15.0, 2.0, 1.57, 0.194, 0.6405),
+                         referenceLimit(1.0, 0.5, 1.0, 0.5, 0.01, 10.0, 15.0, 2.0, 1.57, 0.194, 0.6405))
+
+
+if __name__ == "__main__":
+    unittest.main()